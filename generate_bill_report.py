@@ -6,176 +6,247 @@
 """
 
 import sqlite3
+import functools
+import gzip
+import hashlib
+import itertools
+import json
 import os
 import sys
 import argparse
+import tempfile
 from datetime import datetime, timezone, timedelta
-from decimal import Decimal
+
+# page_templates（各页面的静态CSS/JS块）推迟到真正渲染页面时才导入：
+# main.py的"无需更新"快速路径只用到查询和比较，冷启动不加载模板文本
 
 def connect_database(db_path):
-    """连接数据库"""
+    """连接数据库
+
+    以URI的mode=rw打开：文件不存在时直接在这里失败，而不是隐式
+    创建一个空库，调用方也无需先stat一次数据库路径。
+    """
     try:
-        conn = sqlite3.connect(db_path)
+        # isolation_level=None：纯读工作负载不需要隐式BEGIN/COMMIT簿记；
+        # 语句缓存从默认128提到256，所有SQL常量都留在缓存里
+        conn = sqlite3.connect(f"file:{db_path}?mode=rw", uri=True,
+                               isolation_level=None, cached_statements=256)
+        # 调整默认PRAGMA：默认的2MB页缓存和DELETE日志模式对这类全表/范围
+        # 扫描的只读工作负载并不友好。mmap让SQLite经由OS页缓存直接读页，
+        # 更大的cache_size让整个BILL表在一次运行内保持常驻
+        conn.executescript("""
+            PRAGMA synchronous=NORMAL;
+            PRAGMA mmap_size=268435456;
+            PRAGMA cache_size=-65536;
+            PRAGMA temp_store=MEMORY;
+        """)
+        # journal_mode是随库文件持久化的属性，已经是WAL时无需重设，
+        # 免去每次运行切换模式要走的加锁路径
+        if conn.execute("PRAGMA journal_mode").fetchone()[0] != 'wal':
+            conn.execute("PRAGMA journal_mode=WAL")
+        # 建立覆盖索引：TYPE+TIME范围查询走索引，且UPDATE_TIME聚合
+        # 可以只读索引（index-only）完成，无需回表取行
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_bill_type_time_upd"
+            " ON BILL(TYPE, TIME, UPDATE_TIME)")
+        # 早期版本建的两列索引已被上面的覆盖索引取代
+        conn.execute("DROP INDEX IF EXISTS idx_bill_type_time")
+        # 派生列year_month：把SUBSTR(TIME,1,7)作为生成列挂到表上并入索引，
+        # 按月聚合可以直接扫这棵索引树，不再对每一行调用SUBSTR
+        try:
+            conn.execute(
+                "ALTER TABLE BILL ADD COLUMN year_month TEXT"
+                " GENERATED ALWAYS AS (SUBSTR(TIME, 1, 7)) VIRTUAL")
+        except sqlite3.OperationalError:
+            # duplicate column name：列在之前的运行中已加上
+            pass
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_bill_ym"
+            " ON BILL(TYPE, year_month, UPDATE_TIME)")
+        # 索引建好之后连接只读：挡住误写，也免去每条语句的写锁判断
+        conn.execute("PRAGMA query_only=ON")
         return conn
     except sqlite3.Error as e:
-        print(f"数据库连接错误: {e}")
+        if not os.path.exists(db_path):
+            print(f"错误: 数据库文件 {db_path} 不存在")
+        else:
+            print(f"数据库连接错误: {e}")
         return None
 
-def get_monthly_data(conn, year, month):
-    """获取指定年月的消费数据"""
-    # 格式化年月为字符串，确保月份是两位数
-    year_str = str(year)
-    month_str = f"{month:02d}"
-    date_pattern = f"{year_str}-{month_str}-%"
-    
-    query = """
-    SELECT TIME, AMOUNT, INFO, NOTE, SOURCE, UPDATE_TIME
-    FROM BILL 
-    WHERE TIME LIKE ? AND TYPE = '消费'
+def get_month_range(year, month):
+    """计算指定年月的时间范围 [月初, 下月初)，用于索引范围查询"""
+    start = f"{year:04d}-{month:02d}-01 00:00:00"
+    if month == 12:
+        end = f"{year + 1:04d}-01-01 00:00:00"
+    else:
+        end = f"{year:04d}-{month + 1:02d}-01 00:00:00"
+    return start, end
+
+def get_year_range(year):
+    """计算指定年份的时间范围 [年初, 下年初)，用于索引范围查询"""
+    return f"{year:04d}-01-01 00:00:00", f"{year + 1:04d}-01-01 00:00:00"
+
+def format_update_time(timestamp):
+    """将Unix时间戳格式化为可读的更新时间字符串"""
+    if timestamp:
+        update_time = datetime.fromtimestamp(timestamp, timezone.utc)
+        return update_time.strftime('%Y-%m-%d %H:%M UTC')
+    return "未知"
+
+# SQL语句常量。sqlite3按SQL文本缓存已编译的语句，
+# 固定复用同一字符串对象可以跳过重复的parse/plan
+SQL_MONTHLY_DATA = """
+    SELECT TIME, AMOUNT, INFO, NOTE, SOURCE, UPDATE_TIME,
+           MAX(UPDATE_TIME) OVER () AS max_update
+    FROM BILL
+    WHERE TYPE = '消费' AND TIME >= ? AND TIME < ?
     ORDER BY TIME ASC
     """
-    
-    try:
-        cursor = conn.cursor()
-        cursor.execute(query, (date_pattern,))
-        data = cursor.fetchall()
-        return data
-    except sqlite3.Error as e:
-        print(f"查询数据错误: {e}")
-        return []
 
-def get_latest_update_time(conn, year, month):
-    """获取指定年月数据的最新更新时间"""
-    # 格式化年月为字符串，确保月份是两位数
-    year_str = str(year)
-    month_str = f"{month:02d}"
-    date_pattern = f"{year_str}-{month_str}-%"
-    
-    query = """
-    SELECT MAX(UPDATE_TIME) 
-    FROM BILL 
-    WHERE TIME LIKE ? AND TYPE = '消费'
+# --all模式使用：一次有序扫描取出全部消费数据，按年月分区计算更新时间窗口列，
+# 行结构与SQL_MONTHLY_DATA一致，可以直接按月切分后交给generate_html
+SQL_ALL_MONTHLY_DATA = """
+    SELECT TIME, AMOUNT, INFO, NOTE, SOURCE, UPDATE_TIME,
+           MAX(UPDATE_TIME) OVER (PARTITION BY SUBSTR(TIME, 1, 7)) AS max_update
+    FROM BILL
+    WHERE TYPE = '消费'
+    ORDER BY TIME ASC
     """
-    
-    try:
-        cursor = conn.cursor()
-        cursor.execute(query, (date_pattern,))
-        result = cursor.fetchone()
-        if result and result[0]:
-            # 将Unix时间戳转换为可读格式
-            update_time = datetime.fromtimestamp(result[0], timezone.utc)
-            return update_time.strftime('%Y-%m-%d %H:%M UTC')
-        return "未知"
-    except sqlite3.Error as e:
-        print(f"获取更新时间错误: {e}")
-        return "未知"
 
-def get_annual_data(conn, year):
-    """获取指定年份的月度汇总数据"""
-    year_str = str(year)
-    date_pattern = f"{year_str}-%"
-    
-    query = """
-    SELECT 
-        SUBSTR(TIME, 1, 7) as month,
+# 批量取若干个月的明细：范围谓词+按月分区的更新时间窗口列，
+# 行结构同样与SQL_MONTHLY_DATA一致
+SQL_MONTHLY_RANGE_DATA = """
+    SELECT TIME, AMOUNT, INFO, NOTE, SOURCE, UPDATE_TIME,
+           MAX(UPDATE_TIME) OVER (PARTITION BY SUBSTR(TIME, 1, 7)) AS max_update
+    FROM BILL
+    WHERE TYPE = '消费' AND TIME >= ? AND TIME < ?
+    ORDER BY TIME ASC
+    """
+
+SQL_ANNUAL_DATA = """
+    SELECT
+        year_month as month,
         SUM(AMOUNT) as total_amount,
         COUNT(*) as transaction_count,
         MAX(UPDATE_TIME) as latest_update
-    FROM BILL 
-    WHERE TIME LIKE ? AND TYPE = '消费'
-    GROUP BY SUBSTR(TIME, 1, 7)
+    FROM BILL
+    WHERE TYPE = '消费' AND TIME >= ? AND TIME < ?
+    GROUP BY year_month
     ORDER BY month ASC
     """
-    
-    try:
-        cursor = conn.cursor()
-        cursor.execute(query, (date_pattern,))
-        data = cursor.fetchall()
-        return data
-    except sqlite3.Error as e:
-        print(f"查询年度数据错误: {e}")
-        return []
-
-def get_annual_latest_update_time(conn, year):
-    """获取指定年份数据的最新更新时间"""
-    year_str = str(year)
-    date_pattern = f"{year_str}-%"
-    
-    query = """
-    SELECT MAX(UPDATE_TIME) 
-    FROM BILL 
-    WHERE TIME LIKE ? AND TYPE = '消费'
-    """
-    
-    try:
-        cursor = conn.cursor()
-        cursor.execute(query, (date_pattern,))
-        result = cursor.fetchone()
-        if result and result[0]:
-            # 将Unix时间戳转换为可读格式
-            update_time = datetime.fromtimestamp(result[0], timezone.utc)
-            return update_time.strftime('%Y-%m-%d %H:%M UTC')
-        return "未知"
-    except sqlite3.Error as e:
-        print(f"获取年度更新时间错误: {e}")
-        return "未知"
 
-def get_all_years_data(conn):
-    """获取所有年份的消费数据汇总"""
-    query = """
-    SELECT 
+SQL_ALL_YEARS_DATA = """
+    SELECT
         SUBSTR(TIME, 1, 4) as year,
         SUM(AMOUNT) as total_amount,
         COUNT(*) as transaction_count,
         MAX(UPDATE_TIME) as latest_update
-    FROM BILL 
+    FROM BILL
     WHERE TYPE = '消费'
     GROUP BY SUBSTR(TIME, 1, 4)
     ORDER BY year DESC
     """
-    
-    try:
-        cursor = conn.cursor()
-        cursor.execute(query)
-        data = cursor.fetchall()
-        return data
-    except sqlite3.Error as e:
-        print(f"查询所有年份数据错误: {e}")
-        return []
+
+SQL_LATEST_TIME = """
+    SELECT MAX(TIME)
+    FROM BILL
+    WHERE TYPE = '消费'
+    """
+
+SQL_RECENT_MONTHS_SUMMARY = """
+    SELECT
+        year_month as month,
+        SUM(AMOUNT) as total_amount,
+        COUNT(*) as transaction_count,
+        MAX(UPDATE_TIME) as latest_update
+    FROM BILL
+    WHERE TYPE = '消费' AND TIME >= ? AND TIME < ?
+    GROUP BY year_month
+    """
+
+# UPDATE_TIME本身就是Unix秒，CAST把类型钉死成整数，
+# 跳过判断里与文件mtime的比较始终是整数比较
+SQL_SUMMARY_UPDATE_TIME = """
+    SELECT MAX(CAST(UPDATE_TIME AS INTEGER))
+    FROM BILL
+    WHERE TYPE = '消费'
+    """
+
+SQL_RANGE_UPDATE_TIMESTAMP = """
+    SELECT MAX(CAST(UPDATE_TIME AS INTEGER))
+    FROM BILL
+    WHERE TYPE = '消费' AND TIME >= ? AND TIME < ?
+    """
+
+def get_monthly_data(conn, year, month):
+    """逐行迭代指定年月的消费数据
+
+    直接迭代游标而不是fetchall()，避免先把整月数据物化成列表再遍历一遍；
+    每行末尾附带整月MAX(UPDATE_TIME)窗口列，生成HTML时从中取更新时间。
+    """
+    # 使用范围条件代替LIKE，让SQLite可以利用索引做范围扫描
+    start, end = get_month_range(year, month)
+
+    cursor = conn.execute(SQL_MONTHLY_DATA, (start, end))
+    cursor.arraysize = 1000
+    yield from cursor
+
+def get_monthly_data_bulk(conn, year_months):
+    """批量迭代多个年月的消费明细，逐月产出 (年, 月, 行迭代器)
+
+    月份循环里逐月执行明细查询是典型的N+1模式；这里把需要的月份
+    用一条覆盖整个时间跨度的范围查询一次取回（按TIME有序，月界即
+    分组界），语句的prepare/bind和索引定位只付一次。跨度内不需要
+    的月份直接跳过。
+    """
+    if not year_months:
+        return
+
+    wanted = {f"{year:04d}-{month:02d}" for year, month in year_months}
+    start, _ = get_month_range(*min(year_months))
+    _, end = get_month_range(*max(year_months))
+
+    cursor = conn.execute(SQL_MONTHLY_RANGE_DATA, (start, end))
+    cursor.arraysize = 1000
+
+    for month_key, rows in itertools.groupby(cursor, key=lambda row: row[0][:7]):
+        if month_key in wanted:
+            yield int(month_key[:4]), int(month_key[5:7]), rows
+
+def get_annual_data(conn, year):
+    """获取指定年份的月度汇总数据
+
+    结果集最多12行且调用方需要遍历多次（求和、取最大值、渲染），
+    因此物化成列表而不是像明细查询那样流式迭代。
+    """
+    # 使用范围条件代替LIKE，让SQLite可以利用索引做范围扫描
+    start, end = get_year_range(year)
+
+    return conn.execute(SQL_ANNUAL_DATA, (start, end)).fetchall()
+
+def get_all_years_data(conn):
+    """获取所有年份的消费数据汇总
+
+    每年一行、调用方需要遍历多次，物化成列表即可，无需流式迭代。
+    """
+    return conn.execute(SQL_ALL_YEARS_DATA).fetchall()
 
 def get_recent_3_months_data(conn):
     """获取最近3个月的消费数据汇总"""
     # 先获取数据库中最新一条数据的时间
-    latest_time_query = """
-    SELECT MAX(TIME) 
-    FROM BILL 
-    WHERE TYPE = '消费'
-    """
-    
-    try:
-        cursor = conn.cursor()
-        cursor.execute(latest_time_query)
-        result = cursor.fetchone()
-        
-        if not result or not result[0]:
-            print("未找到任何消费数据")
-            return []
-        
-        # 解析最新数据的时间
-        latest_time_str = result[0]
-        latest_time = datetime.strptime(latest_time_str, '%Y-%m-%d %H:%M:%S')
-        latest_year = latest_time.year
-        latest_month = latest_time.month
-        
-        print(f"数据库中最新的消费数据时间: {latest_year}年{latest_month}月")
-        
-    except sqlite3.Error as e:
-        print(f"查询最新数据时间错误: {e}")
-        return []
-    except ValueError as e:
-        print(f"解析时间格式错误: {e}")
+    result = conn.execute(SQL_LATEST_TIME).fetchone()
+
+    if not result or not result[0]:
+        print("未找到任何消费数据")
         return []
-    
+
+    # 解析最新数据的时间
+    latest_time = datetime.strptime(result[0], '%Y-%m-%d %H:%M:%S')
+    latest_year = latest_time.year
+    latest_month = latest_time.month
+
+    print(f"数据库中最新的消费数据时间: {latest_year}年{latest_month}月")
+
     # 从最新数据所在的月份开始往前取3个月
     months = []
     for i in range(3):
@@ -192,228 +263,252 @@ def get_recent_3_months_data(conn):
     # 按时间倒序排列
     months.sort(reverse=True)
     
+    # 一条GROUP BY覆盖整个3个月窗口，代替逐月执行聚合查询：
+    # 同一范围只扫描一遍，也省掉两次额外的语句执行开销
+    window_start, _ = get_month_range(*months[-1])
+    _, window_end = get_month_range(*months[0])
+
+    rows = conn.execute(SQL_RECENT_MONTHS_SUMMARY, (window_start, window_end)).fetchall()
+
+    by_month = {row[0]: row for row in rows}
+
     monthly_data = []
     for year, month in months:
-        year_str = str(year)
-        month_str = f"{month:02d}"
-        date_pattern = f"{year_str}-{month_str}-%"
-        
-        query = """
-        SELECT 
-            SUM(AMOUNT) as total_amount,
-            COUNT(*) as transaction_count,
-            MAX(UPDATE_TIME) as latest_update
-        FROM BILL 
-        WHERE TIME LIKE ? AND TYPE = '消费'
-        """
-        
-        try:
-            cursor = conn.cursor()
-            cursor.execute(query, (date_pattern,))
-            result = cursor.fetchone()
-            if result and result[0] is not None:
-                # 有数据的情况
-                monthly_data.append((year, month, float(result[0]), result[1], result[2]))
-            else:
-                # 没有数据的情况，显示为0
-                monthly_data.append((year, month, 0.0, 0, None))
-        except sqlite3.Error as e:
-            print(f"查询{year}年{month}月数据错误: {e}")
-            # 即使查询出错，也添加一个0金额的条目
+        row = by_month.get(f"{year:04d}-{month:02d}")
+        if row is not None and row[1] is not None:
+            # 有数据的情况
+            monthly_data.append((year, month, float(row[1]), row[2], row[3]))
+        else:
+            # 没有数据的情况，显示为0
             monthly_data.append((year, month, 0.0, 0, None))
-    
+
     return monthly_data
 
-def get_summary_latest_update_time(conn):
-    """获取汇总数据的最新更新时间"""
-    query = """
-    SELECT MAX(UPDATE_TIME) 
-    FROM BILL 
-    WHERE TYPE = '消费'
-    """
-    
-    try:
-        cursor = conn.cursor()
-        cursor.execute(query)
-        result = cursor.fetchone()
-        if result and result[0]:
-            # 将Unix时间戳转换为可读格式
-            update_time = datetime.fromtimestamp(result[0], timezone.utc)
-            return update_time.strftime('%Y-%m-%d %H:%M UTC')
-        return "未知"
-    except sqlite3.Error as e:
-        print(f"获取汇总更新时间错误: {e}")
-        return "未知"
+def get_update_timestamp(conn, start=None, end=None):
+    """获取指定时间范围（不指定则为全部数据）的最新更新时间戳（原始Unix秒）"""
+    if start is not None:
+        result = conn.execute(SQL_RANGE_UPDATE_TIMESTAMP, (start, end)).fetchone()
+    else:
+        result = conn.execute(SQL_SUMMARY_UPDATE_TIME).fetchone()
+    return result[0] if result else None
 
-def calculate_total_amount(data):
-    """计算总金额"""
-    total = Decimal('0')
-    for row in data:
-        total += Decimal(str(row[1]))
-    return total
+def is_output_up_to_date(output_file, db_timestamp):
+    """输出文件是否仍然是最新的（文件修改时间不早于数据库最新更新时间）"""
+    if db_timestamp is None:
+        return False
+    try:
+        return os.path.getmtime(output_file) >= db_timestamp
+    except OSError:
+        return False
 
+@functools.lru_cache(maxsize=4096)
 def format_amount(amount):
-    """格式化金额显示"""
+    """格式化金额显示（纯函数，重复金额直接命中缓存）"""
     return f"¥{amount:.2f}"
 
-def generate_html(data, total_amount, update_time, year, month):
-    """生成HTML页面"""
-    month_names = ["", "一月", "二月", "三月", "四月", "五月", "六月", 
-                   "七月", "八月", "九月", "十月", "十一月", "十二月"]
-    month_name = month_names[month]
-    
-    html_content = f"""<!DOCTYPE html>
+def _write_gzip_file(gz_file, encoded):
+    """原子地写出预压缩副本：同目录临时文件 + os.replace
+
+    mtime=0让相同内容产生逐字节相同的.gz，配合内容跳过逻辑。
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(gz_file) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb', buffering=1 << 20) as raw:
+            # filename指定最终文件名：FNAME头字段与直接写最终路径时一致
+            with gzip.GzipFile(gz_file, 'wb', fileobj=raw,
+                               compresslevel=9, mtime=0) as f:
+                f.writelines(encoded)
+        # mkstemp建的临时文件是0600；放宽成常规的0644，
+        # 替换到位后Web服务器进程才读得到
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, gz_file)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def write_html_file(output_file, html_content):
+    """写出HTML文件，并生成预压缩的.gz副本
+
+    账单页面是静态内容，压缩在生成时只做一次；Web服务器（如nginx的
+    gzip_static）可以直接发送.gz副本，省去每次请求的实时压缩。
+    页面之间通过.html文件名互相链接，因此未压缩文件仍保留。
+
+    html_content为HTML片段列表，直接writelines写出，
+    避免先join成整页大字符串再复制一遍。
+
+    内容与磁盘上的旧文件完全一致时跳过重写、只前移mtime：
+    重复构建不反复改写文件，不打扰Web服务器侧的缓存（ETag/sendfile），
+    而基于修改时间的跳过逻辑仍然有效。实际写入经由同目录临时文件
+    加os.replace原子替换，读者任何时刻看到的都是完整页面。
+    """
+    encoded = [part.encode('utf-8') for part in html_content]
+    digest = hashlib.blake2b(digest_size=16)
+    for part in encoded:
+        digest.update(part)
+
+    try:
+        with open(output_file, 'rb') as f:
+            # 分块流式哈希，大的年度页面不必整个读进内存
+            old_hash = hashlib.blake2b(digest_size=16)
+            while chunk := f.read(1 << 18):
+                old_hash.update(chunk)
+            old_digest = old_hash.digest()
+    except OSError:
+        old_digest = None
+
+    gz_file = output_file + '.gz'
+
+    if old_digest == digest.digest():
+        # 先处理.gz再前移.html的mtime：mtime是跳过判断的闸门，
+        # 补写.gz失败时不提前闸门，下次运行还会回到这里重试
+        if os.path.exists(gz_file):
+            os.utime(gz_file)
+        else:
+            _write_gzip_file(gz_file, encoded)
+        os.utime(output_file)
+        return
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(output_file) or '.', suffix='.tmp')
+    try:
+        # 1MiB写缓冲：页面片段合并成少量write(2)调用落盘
+        with os.fdopen(fd, 'wb', buffering=1 << 20) as f:
+            f.writelines(encoded)
+        # .gz先落盘再替换.html：.html的mtime是跳过判断的闸门，
+        # 它的替换必须是最后一步——若.gz写在其后并中途失败，
+        # 过期的.gz会躲在新mtime后面永远不被重写
+        _write_gzip_file(gz_file, encoded)
+        # mkstemp建的临时文件是0600；放宽成常规的0644，
+        # 替换到位后Web服务器进程才读得到
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, output_file)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+# 月份中文名（下标即月份数字），模块级常量避免每次生成页面时重新分配列表
+MONTH_NAMES = ("", "一月", "二月", "三月", "四月", "五月", "六月",
+               "七月", "八月", "九月", "十月", "十一月", "十二月")
+
+# HTML转义表。str.translate是C级的单遍扫描，比对每个字段调用html.escape更快；
+# 覆盖的字符集与html.escape(quote=True)一致。
+# INFO/NOTE/SOURCE经此转义后才会进入HTML或懒加载JSON，
+# 转义后的内容不含'<'，因此内联JSON不可能出现'</script>'提前闭合标签
+HTML_ESCAPE_TABLE = str.maketrans({
+    '&': '&amp;',
+    '<': '&lt;',
+    '>': '&gt;',
+    '"': '&quot;',
+    "'": '&#x27;',
+})
+
+# 支付方式到装饰条样式的映射，未知来源使用默认灰色（空类名）
+DECORATION_BY_SOURCE = {
+    "ALIPAY": "alipay",
+    "WECHAT": "wechat",
+    "CMBCC": "cmbcc",
+}
+
+# 月度页面首屏直接渲染的交易条数。超出部分以内联JSON形式嵌入页面，
+# 滚动到底部时由IntersectionObserver分批补入DOM，
+# 大月份的首次渲染不再需要一次性布局上千个节点
+FIRST_PAGE_ROWS = 200
+
+def generate_html(data, year, month):
+    """生成HTML页面
+
+    data为逐行迭代的消费数据，边遍历边累计总金额、拼装交易明细片段，
+    最后再渲染头部，整个过程只扫描一遍数据。
+    返回 (HTML片段列表, 总金额, 更新时间字符串)；无数据时片段列表为None。
+    """
+    from page_templates import MONTHLY_PAGE_STYLE
+
+    month_name = MONTH_NAMES[month]
+
+    # 单次遍历：按整数"分"累计总金额（比逐行Decimal快得多且无浮点误差），
+    # 同时把每条交易拼成HTML片段
+    total_cents = 0
+    update_timestamp = None
+    transaction_parts = []
+    # 超出首屏的行只收集成紧凑数组，由页面JS按需补入DOM
+    rest_rows = []
+    # 把循环里反复访问的全局名/方法绑定为局部变量，
+    # 大月份（上万行）时省去每行的全局查找和属性查找开销
+    parts_append = transaction_parts.append
+    rest_append = rest_rows.append
+    escape_table = HTML_ESCAPE_TABLE
+    decoration_get = DECORATION_BY_SOURCE.get
+    first_page_rows = FIRST_PAGE_ROWS
+
+    # 在for头部直接解包行元组：一次C级UNPACK_SEQUENCE取出全部字段，
+    # 避免循环体内逐个row[i]下标访问
+    for time_str, amount, info, note, source, _update, max_update in data:
+        # INFO/NOTE/SOURCE是用户可控内容，插入HTML前必须转义
+        # （SOURCE要先大写再转义，见下）
+        info = (info or "").translate(escape_table)
+        note = (note or "").translate(escape_table)
+
+        if update_timestamp is None:
+            update_timestamp = max_update
+        amount_cents = int(round(amount * 100))
+        total_cents += amount_cents
+
+        # 格式化时间显示 (只显示月-日 时:分)
+        # TIME的格式固定为 YYYY-MM-DD HH:MM:SS，直接切片比逐行strptime快一个数量级
+        if len(time_str) == 19:
+            formatted_time = f"{time_str[5:10]} {time_str[11:16]}"
+        else:
+            # 格式异常时原样显示
+            formatted_time = time_str
+
+        # 格式化支付方式显示：在原始值上取大写（转义后再大写会把
+        # &lt;这类转义序列一并改成大写形式），随后再转义供输出
+        source_upper = (source or "").upper()
+        source_display = source_upper.translate(escape_table)
+
+        # 处理备注显示（'/'和空白视为无备注）
+        if not (note and note.strip() and note != '/'):
+            note = ""
+
+        # 确定装饰条颜色（按未转义的原始大写值匹配）
+        decoration_class = decoration_get(source_upper, "")
+
+        if len(transaction_parts) >= first_page_rows:
+            # 超出首屏的行不生成HTML，按页面JS约定的字段顺序收集：
+            # [order值, 装饰条类名, 描述, 时间, 备注, 金额, 支付方式]
+            rest_append([-amount_cents, decoration_class, info, formatted_time,
+                         note, f"{amount:.2f}", source_display])
+            continue
+
+        note_display = f'<span class="transaction-note">{note}</span>' if note else ""
+
+        # 行片段压成单行：每行数百字节的缩进和换行在几千行的大月份里
+        # 累积成兆级的纯空白，省掉后构建、写盘、压缩、解析都更快；
+        # 结构与懒加载JS拼出的行完全一致。
+        # --ao取负的金额分值作为flex order，浏览器端按金额排序时无需任何计算
+        parts_append(
+            f'\n<div class="transaction-item" style="--ao:{-amount_cents}">'
+            f'<div class="transaction-decoration {decoration_class}"></div>'
+            '<div class="transaction-left">'
+            f'<div class="transaction-description">{info}</div>'
+            f'<div class="transaction-meta"><span>{formatted_time}</span>{note_display}</div>'
+            '</div><div class="transaction-right">'
+            f'<div class="transaction-amount">¥{amount:.2f}</div>'
+            f'<div class="transaction-source">{source_display}</div>'
+            '</div></div>')
+
+    if not transaction_parts:
+        return None, 0.0, "未知"
+
+    total_amount = total_cents / 100
+    update_time = format_update_time(update_timestamp)
+
+    parts = [f"""<!DOCTYPE html>
 <html lang="zh-CN">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>{year}年{month_name}账单</title>
-    <style>
-        body {{
-            font-family: 'Microsoft YaHei', Arial, sans-serif;
-            margin: 0;
-            padding: 20px;
-            background-color: white;
-            color: #333;
-        }}
-        .container {{
-            max-width: 800px;
-            margin: 0 auto;
-            background: white;
-        }}
-        .header {{
-            padding: 20px 0;
-            border-bottom: 1px solid #eee;
-            position: relative;
-        }}
-        .header h1 {{
-            margin: 0 0 20px 0;
-            font-size: 1.4em;
-            font-weight: 500;
-            color: #333;
-        }}
-        .total-amount {{
-            font-size: 3em;
-            font-weight: bold;
-            color: #333;
-            margin: 20px 0;
-        }}
-        .update-time {{
-            position: absolute;
-            top: 20px;
-            right: 0;
-            font-size: 0.9em;
-            color: #666;
-            text-align: right;
-        }}
-        .sort-control {{
-            position: absolute;
-            top: 85px;
-            right: 0;
-            z-index: 10;
-        }}
-        .sort-select {{
-            padding: 8px 12px;
-            border: 1px solid #333;
-            background: white;
-            font-size: 0.9em;
-            cursor: pointer;
-        }}
-        .transaction-list {{
-            margin-top: 20px;
-        }}
-        .transaction-item {{
-            padding: 15px 0 15px 15px;
-            border-bottom: 1px solid #eee;
-            display: flex;
-            justify-content: space-between;
-            position: relative;
-        }}
-        .transaction-decoration {{
-            position: absolute;
-            left: 0;
-            top: 20px;
-            bottom: 20px;
-            width: 4px;
-            border-radius: 2px;
-            background-color: #6c757d;
-        }}
-        .transaction-decoration.cmbcc {{
-            background-color: #dc3545;
-        }}
-        .transaction-decoration.alipay {{
-            background-color: #007bff;
-        }}
-        .transaction-decoration.wechat {{
-            background-color: #28a745;
-        }}
-        .transaction-item:last-child {{
-            border-bottom: none;
-        }}
-        .transaction-left {{
-            flex: 1;
-            margin-right: 20px;
-        }}
-        .transaction-description {{
-            font-size: 1em;
-            color: #333;
-            margin-bottom: 5px;
-            line-height: 1.4;
-        }}
-        .transaction-meta {{
-            display: flex;
-            align-items: center;
-            gap: 10px;
-            font-size: 0.85em;
-            color: #666;
-        }}
-        .transaction-note {{
-            color: #666;
-        }}
-        .transaction-right {{
-            text-align: right;
-            flex-shrink: 0;
-            display: flex;
-            flex-direction: column;
-            justify-content: center;
-        }}
-        .transaction-amount {{
-            font-size: 1em;
-            font-weight: 500;
-            color: #333;
-            margin-bottom: 3px;
-        }}
-        .transaction-source {{
-            font-size: 0.8em;
-            color: #666;
-        }}
-    </style>
-    <script>
-        function sortTransactions() {{
-            const select = document.getElementById('sortSelect');
-            const transactionList = document.querySelector('.transaction-list');
-            const transactions = Array.from(transactionList.querySelectorAll('.transaction-item'));
-            
-            if (select.value === 'amount') {{
-                // 按金额降序排序
-                transactions.sort((a, b) => {{
-                    const amountA = parseFloat(a.querySelector('.transaction-amount').textContent.replace('¥', ''));
-                    const amountB = parseFloat(b.querySelector('.transaction-amount').textContent.replace('¥', ''));
-                    return amountB - amountA;
-                }});
-            }} else {{
-                // 按时间排序（原始顺序）
-                transactions.sort((a, b) => {{
-                    const timeA = a.querySelector('.transaction-meta span').textContent;
-                    const timeB = b.querySelector('.transaction-meta span').textContent;
-                    return timeA.localeCompare(timeB);
-                }});
-            }}
-            
-            // 重新排列DOM元素
-            transactions.forEach(transaction => transactionList.appendChild(transaction));
-        }}
-    </script>
+{MONTHLY_PAGE_STYLE}
 </head>
 <body>
     <div class="container">
@@ -429,197 +524,43 @@ def generate_html(data, total_amount, update_time, year, month):
             <div class="total-amount">{format_amount(total_amount)}</div>
         </div>
         
-        <div class="transaction-list">"""
-
-    # 添加交易数据
-    for row in data:
-        time_str = row[0]
-        amount = row[1]
-        info = row[2] or ""
-        note = row[3] or ""
-        source = row[4] or ""
-        
-        # 格式化时间显示 (只显示月-日 时:分)
-        try:
-            dt = datetime.strptime(time_str, '%Y-%m-%d %H:%M:%S')
-            formatted_time = dt.strftime('%m-%d %H:%M')
-        except:
-            formatted_time = time_str
-        
-        # 格式化支付方式显示
-        source_display = source.upper() if source else ""
-        
-        # 处理备注显示
-        note_display = ""
-        if note and note.strip() and note != '/':
-            note_display = f'<span class="transaction-note">{note}</span>'
-        
-        # 确定装饰条颜色
-        decoration_class = ""
-        if source_display == "ALIPAY":
-            decoration_class = "alipay"
-        elif source_display == "WECHAT":
-            decoration_class = "wechat"
-        elif source_display == "CMBCC":
-            decoration_class = "cmbcc"
+        <div class="transaction-list">"""]
 
-        
-        html_content += f"""
-            <div class="transaction-item">
-                <div class="transaction-decoration {decoration_class}"></div>
-                <div class="transaction-left">
-                    <div class="transaction-description">{info}</div>
-                    <div class="transaction-meta">
-                        <span>{formatted_time}</span>
-                        {note_display}
-                    </div>
-                </div>
-                <div class="transaction-right">
-                    <div class="transaction-amount">{format_amount(amount)}</div>
-                    <div class="transaction-source">{source_display}</div>
-                </div>
-            </div>"""
-
-    html_content += """
-        </div>
+    parts.extend(transaction_parts)
+
+    parts.append("""
+        </div>""")
+
+    if rest_rows:
+        # 剩余行内联为JSON供页面JS懒加载。各字段已做HTML转义（'<'变为&lt;），
+        # 因此内容中不可能出现'</script>'提前闭合脚本标签
+        rest_json = json.dumps(rest_rows, ensure_ascii=False, separators=(',', ':'))
+        parts.append(f"""
+        <div class="lazy-sentinel" id="lazySentinel"></div>
+        <script type="application/json" id="restRows">{rest_json}</script>""")
+
+    parts.append("""
     </div>
 </body>
-</html>"""
-    
-    return html_content
+</html>""")
+
+    return parts, total_amount, update_time
 
 def generate_annual_html(monthly_data, total_amount, update_time, year):
-    """生成年度账单HTML页面"""
-    html_content = f"""<!DOCTYPE html>
+    """生成年度账单HTML页面
+
+    页面内容收集为片段列表直接返回，由write_html_file流式写出，
+    避免循环内字符串+=的反复整体拷贝（总量上是O(n^2)的）。
+    """
+    from page_templates import ANNUAL_PAGE_STYLE
+
+    parts = [f"""<!DOCTYPE html>
 <html lang="zh-CN">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>{year}年度账单</title>
-    <style>
-        body {{
-            font-family: 'Microsoft YaHei', Arial, sans-serif;
-            margin: 0;
-            padding: 20px;
-            background-color: white;
-            color: #333;
-        }}
-        .container {{
-            max-width: 800px;
-            margin: 0 auto;
-            background: white;
-        }}
-        .header {{
-            padding: 20px 0;
-            border-bottom: 1px solid #eee;
-            position: relative;
-        }}
-        .header h1 {{
-            margin: 0 0 20px 0;
-            font-size: 1.4em;
-            font-weight: 500;
-            color: #333;
-        }}
-        .total-amount {{
-            font-size: 3em;
-            font-weight: bold;
-            color: #333;
-            margin: 20px 0;
-        }}
-        .update-time {{
-            position: absolute;
-            top: 20px;
-            right: 0;
-            font-size: 0.9em;
-            color: #666;
-            text-align: right;
-        }}
-        .sort-control {{
-            position: absolute;
-            top: 85px;
-            right: 0;
-            z-index: 10;
-        }}
-        .sort-select {{
-            padding: 8px 12px;
-            border: 1px solid #333;
-            background: white;
-            font-size: 0.9em;
-            cursor: pointer;
-        }}
-        .monthly-list {{
-            margin-top: 20px;
-        }}
-        .monthly-item {{
-            display: block;
-            padding: 20px 0;
-            border-bottom: 1px solid #eee;
-            position: relative;
-            cursor: pointer;
-            text-decoration: none;
-            color: inherit;
-        }}
-        .monthly-item:last-child {{
-            border-bottom: none;
-        }}
-        .monthly-header {{
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            margin-bottom: 10px;
-        }}
-        .month-label {{
-            font-size: 1.1em;
-            font-weight: 500;
-            color: #333;
-        }}
-        .month-amount {{
-            font-size: 1.1em;
-            font-weight: 500;
-            color: #333;
-        }}
-        .progress-bar-container {{
-            width: 100%;
-            height: 12px;
-            background-color: #f0f0f0;
-            border-radius: 6px;
-            overflow: hidden;
-            position: relative;
-        }}
-        .progress-bar {{
-            height: 100%;
-            background-color: #007bff;
-            border-radius: 6px;
-            transition: width 0.3s ease;
-        }}
-    </style>
-    <script>
-        function sortMonthlyData() {{
-            const select = document.getElementById('sortSelect');
-            const monthlyList = document.querySelector('.monthly-list');
-            const monthlyItems = Array.from(monthlyList.querySelectorAll('.monthly-item'));
-            
-            if (select.value === 'amount') {{
-                // 按金额降序排序
-                monthlyItems.sort((a, b) => {{
-                    const amountA = parseFloat(a.querySelector('.month-amount').textContent.replace('¥', ''));
-                    const amountB = parseFloat(b.querySelector('.month-amount').textContent.replace('¥', ''));
-                    return amountB - amountA;
-                }});
-            }} else {{
-                // 按时间排序（原始顺序）
-                monthlyItems.sort((a, b) => {{
-                    const monthA = a.querySelector('.month-label').textContent;
-                    const monthB = b.querySelector('.month-label').textContent;
-                    return monthA.localeCompare(monthB);
-                }});
-            }}
-            
-            // 重新排列DOM元素
-            monthlyItems.forEach(item => monthlyList.appendChild(item));
-        }}
-        
-    </script>
+{ANNUAL_PAGE_STYLE}
 </head>
 <body>
     <div class="container">
@@ -635,17 +576,17 @@ def generate_annual_html(monthly_data, total_amount, update_time, year):
             <div class="total-amount">{format_amount(total_amount)}</div>
         </div>
         
-        <div class="monthly-list">"""
+        <div class="monthly-list">"""]
+
+    # 金额只做一次float转换，最大值（用于进度条比例）直接在该列表上求取
+    amounts = [float(row[1]) for row in monthly_data]
+    max_amount = max(amounts, default=1.0)
 
-    # 计算最大金额用于进度条比例
-    max_amount = max([float(row[1]) for row in monthly_data]) if monthly_data else 1
-    
     # 添加月度数据
-    for row in monthly_data:
+    for row, amount in zip(monthly_data, amounts):
         month_str = row[0]  # 格式: YYYY-MM
-        amount = float(row[1])
         transaction_count = row[2]
-        
+
         # 提取月份数字
         month_num = int(month_str.split('-')[1])
         month_display = f"{month_num:02d}月"
@@ -656,132 +597,40 @@ def generate_annual_html(monthly_data, total_amount, update_time, year):
         # 生成月度账单文件名
         month_filename = f"bill_{year}_{month_num:02d}.html"
         
-        html_content += f"""
-            <a href="{month_filename}" class="monthly-item">
-                <div class="monthly-header">
-                    <div class="month-label">{month_display}</div>
-                    <div class="month-amount">{format_amount(amount)}</div>
-                </div>
-                <div class="progress-bar-container">
-                    <div class="progress-bar" style="width: {progress_width:.1f}%"></div>
-                </div>
-            </a>"""
-
-    html_content += """
+        # 行片段压成单行，减少生成和传输的纯空白字节
+        # --ao取负的金额分值作为flex order，浏览器端按金额排序时无需任何计算
+        parts.append(
+            f'\n<a href="{month_filename}" class="monthly-item" style="--ao:{-int(round(amount * 100))}">'
+            '<div class="monthly-header">'
+            f'<div class="month-label">{month_display}</div>'
+            f'<div class="month-amount">{format_amount(amount)}</div>'
+            '</div><div class="progress-bar-container">'
+            f'<div class="progress-bar" style="width: {progress_width:.1f}%"></div>'
+            '</div></a>')
+
+    parts.append("""
         </div>
     </div>
 </body>
-</html>"""
-    
-    return html_content
+</html>""")
+
+    return parts
 
 def generate_summary_html(recent_months_data, all_years_data, update_time):
-    """生成历史账单汇总HTML页面"""
-    html_content = f"""<!DOCTYPE html>
+    """生成历史账单汇总HTML页面
+
+    页面内容收集为片段列表直接返回，由write_html_file流式写出，
+    避免循环内字符串+=的反复整体拷贝。
+    """
+    from page_templates import SUMMARY_PAGE_STYLE
+
+    parts = [f"""<!DOCTYPE html>
 <html lang="zh-CN">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>历史账单汇总</title>
-    <style>
-        body {{
-            font-family: 'Microsoft YaHei', Arial, sans-serif;
-            margin: 0;
-            padding: 20px;
-            background-color: white;
-            color: #333;
-        }}
-        .container {{
-            max-width: 1000px;
-            margin: 0 auto;
-            background: white;
-        }}
-        .header {{
-            padding: 20px 0;
-            border-bottom: 1px solid #eee;
-            position: relative;
-        }}
-        .header h1 {{
-            margin: 0 0 20px 0;
-            font-size: 1.8em;
-            font-weight: 500;
-            color: #333;
-        }}
-        .update-time {{
-            position: absolute;
-            top: 20px;
-            right: 0;
-            font-size: 0.9em;
-            color: #666;
-            text-align: right;
-        }}
-        .section {{
-            margin: 30px 0;
-        }}
-        .section-title {{
-            font-size: 1.2em;
-            font-weight: 500;
-            color: #333;
-            margin-bottom: 20px;
-        }}
-        .summary-grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-            gap: 20px;
-            margin-bottom: 30px;
-        }}
-        .summary-item {{
-            background-color: #e3f2fd;
-            border-radius: 8px;
-            padding: 20px;
-            text-align: center;
-            text-decoration: none;
-            color: inherit;
-            transition: background-color 0.3s ease;
-        }}
-        .summary-item:hover {{
-            background-color: #bbdefb;
-        }}
-        .summary-period {{
-            font-size: 1em;
-            font-weight: 500;
-            color: #333;
-            margin-bottom: 10px;
-        }}
-        .summary-amount {{
-            font-size: 1.2em;
-            font-weight: bold;
-            color: #333;
-        }}
-        .years-grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(150px, 1fr));
-            gap: 15px;
-        }}
-        .year-item {{
-            background-color: #e3f2fd;
-            border-radius: 8px;
-            padding: 15px;
-            text-align: center;
-            text-decoration: none;
-            color: inherit;
-            transition: background-color 0.3s ease;
-        }}
-        .year-item:hover {{
-            background-color: #bbdefb;
-        }}
-        .year-period {{
-            font-size: 0.9em;
-            font-weight: 500;
-            color: #333;
-            margin-bottom: 8px;
-        }}
-        .year-amount {{
-            font-size: 1.1em;
-            font-weight: bold;
-            color: #333;
-        }}
-    </style>
+{SUMMARY_PAGE_STYLE}
 </head>
 <body>
     <div class="container">
@@ -792,30 +641,26 @@ def generate_summary_html(recent_months_data, all_years_data, update_time):
         
         <div class="section">
             <div class="section-title">最近3个月消费汇总</div>
-            <div class="summary-grid">"""
+            <div class="summary-grid">"""]
 
     # 添加最近3个月数据
     for year, month, amount, transaction_count, latest_update in recent_months_data:
-        month_names = ["", "一月", "二月", "三月", "四月", "五月", "六月", 
-                       "七月", "八月", "九月", "十月", "十一月", "十二月"]
-        month_name = month_names[month]
-        
         # 生成月度账单文件名
         month_filename = f"bill_{year}_{month:02d}.html"
         
-        html_content += f"""
-                <a href="{month_filename}" class="summary-item">
-                    <div class="summary-period">{year}年{month:02d}月</div>
-                    <div class="summary-amount">{format_amount(amount)}</div>
-                </a>"""
+        # 行片段压成单行，减少生成和传输的纯空白字节
+        parts.append(
+            f'\n<a href="{month_filename}" class="summary-item">'
+            f'<div class="summary-period">{year}年{month:02d}月</div>'
+            f'<div class="summary-amount">{format_amount(amount)}</div></a>')
 
-    html_content += """
+    parts.append("""
             </div>
         </div>
         
         <div class="section">
             <div class="section-title">各年份消费汇总</div>
-            <div class="years-grid">"""
+            <div class="years-grid">""")
 
     # 添加所有年份数据
     for row in all_years_data:
@@ -826,20 +671,110 @@ def generate_summary_html(recent_months_data, all_years_data, update_time):
         # 生成年度账单文件名
         year_filename = f"bill_{year}_annual.html"
         
-        html_content += f"""
-                <a href="{year_filename}" class="year-item">
-                    <div class="year-period">{year}年</div>
-                    <div class="year-amount">{format_amount(amount)}</div>
-                </a>"""
+        parts.append(
+            f'\n<a href="{year_filename}" class="year-item">'
+            f'<div class="year-period">{year}年</div>'
+            f'<div class="year-amount">{format_amount(amount)}</div></a>')
 
-    html_content += """
+    parts.append("""
             </div>
         </div>
     </div>
 </body>
-</html>"""
-    
-    return html_content
+</html>""")
+
+    return parts
+
+def _tally_rows(rows, stats):
+    """透传行的同时累计条数和最新更新时间，stats为[count, latest_update]"""
+    for row in rows:
+        stats[0] += 1
+        update = row[5]
+        if update and (stats[1] is None or update > stats[1]):
+            stats[1] = update
+        yield row
+
+def generate_all_reports(conn, web_dir):
+    """一次扫描生成全部月度、年度和汇总页面
+
+    单独生成每个页面需要打开数据库十几次，每次都重新付出连接、
+    语句编译和页缓存预热的成本。这里改为一条按TIME排序的查询流式读取
+    整库消费数据，用itertools.groupby按年月切分后直接驱动generate_html；
+    每月的总金额、条数和最新更新时间在同一遍扫描中顺带累计，
+    再用来渲染年度页面和汇总页面。
+    """
+    cursor = conn.execute(SQL_ALL_MONTHLY_DATA)
+    cursor.arraysize = 1000
+
+    # (年, 月) -> (总金额, 条数, 最新更新时间)
+    monthly_rollup = {}
+
+    for month_key, rows in itertools.groupby(cursor, key=lambda row: row[0][:7]):
+        year = int(month_key[:4])
+        month = int(month_key[5:7])
+
+        stats = [0, None]
+        html_content, total_amount, _ = generate_html(
+            _tally_rows(rows, stats), year, month)
+        if html_content is None:
+            continue
+
+        output_file = os.path.join(web_dir, f"bill_{year}_{month:02d}.html")
+        write_html_file(output_file, html_content)
+        print(f"HTML页面已生成: {output_file}")
+
+        monthly_rollup[(year, month)] = (total_amount, stats[0], stats[1])
+
+    if not monthly_rollup:
+        print("未找到任何消费数据")
+        return
+
+    # 年度页面：月度汇总行的结构与SQL_ANNUAL_DATA的结果一致
+    annual_months = {}
+    for (year, month), (total, count, latest) in sorted(monthly_rollup.items()):
+        annual_months.setdefault(year, []).append(
+            (f"{year:04d}-{month:02d}", total, count, latest))
+
+    for year, monthly_data in annual_months.items():
+        total_amount = sum(row[1] for row in monthly_data)
+        update_time = format_update_time(
+            max((row[3] for row in monthly_data if row[3]), default=None))
+        html_content = generate_annual_html(monthly_data, total_amount, update_time, year)
+
+        output_file = os.path.join(web_dir, f"bill_{year}_annual.html")
+        write_html_file(output_file, html_content)
+        print(f"年度HTML页面已生成: {output_file}")
+
+    # 汇总页面：按年倒序的年度汇总 + 以最新数据月份为基准的最近3个月
+    all_years_data = []
+    for year in sorted(annual_months, reverse=True):
+        monthly_data = annual_months[year]
+        all_years_data.append((
+            str(year),
+            sum(row[1] for row in monthly_data),
+            sum(row[2] for row in monthly_data),
+            max((row[3] for row in monthly_data if row[3]), default=None),
+        ))
+
+    latest_year, latest_month = max(monthly_rollup)
+    recent_months_data = []
+    for i in range(3):
+        target_year = latest_year
+        target_month = latest_month - i
+        while target_month <= 0:
+            target_month += 12
+            target_year -= 1
+        total, count, latest = monthly_rollup.get(
+            (target_year, target_month), (0.0, 0, None))
+        recent_months_data.append((target_year, target_month, total, count, latest))
+
+    update_time = format_update_time(
+        max((row[3] for row in all_years_data if row[3]), default=None))
+    html_content = generate_summary_html(recent_months_data, all_years_data, update_time)
+
+    output_file = os.path.join(web_dir, "bill_summary.html")
+    write_html_file(output_file, html_content)
+    print(f"汇总HTML页面已生成: {output_file}")
 
 def parse_arguments():
     """解析命令行参数"""
@@ -847,17 +782,18 @@ def parse_arguments():
     parser.add_argument('year', type=int, nargs='?', help='年份 (例如: 2025)，不指定则生成汇总页面')
     parser.add_argument('--month', type=int, help='月份 (1-12)，不指定则生成年度账单')
     parser.add_argument('--summary', action='store_true', help='生成历史账单汇总页面')
+    parser.add_argument('--all', action='store_true', help='一次生成全部月度、年度和汇总页面')
     parser.add_argument('--db', default='billing.sqlite', help='数据库文件路径 (默认: billing.sqlite)')
-    
+
     args = parser.parse_args()
-    
+
     # 验证月份范围（如果指定了月份）
     if args.month is not None and not (1 <= args.month <= 12):
         print("错误: 月份必须在1-12之间")
         sys.exit(1)
-    
-    # 如果没有指定年份且没有指定summary，则默认为summary
-    if args.year is None and not args.summary:
+
+    # 如果没有指定年份且没有指定summary/all，则默认为summary
+    if args.year is None and not args.summary and not args.all:
         args.summary = True
     
     return args
@@ -872,26 +808,31 @@ def main():
     summary = args.summary
     db_path = args.db
     
-    # 检查数据库文件是否存在
-    if not os.path.exists(db_path):
-        print(f"错误: 数据库文件 {db_path} 不存在")
-        return
-    
-    # 连接数据库
+    # 连接数据库（文件不存在的情况由connect_database报告）
     conn = connect_database(db_path)
     if not conn:
         return
     
     try:
-        # 确保web目录存在
+        # 确保web目录存在（exist_ok避免先exists再makedirs的两次系统调用和竞态）
         web_dir = "web"
-        if not os.path.exists(web_dir):
-            os.makedirs(web_dir)
-        
-        if summary:
+        os.makedirs(web_dir, exist_ok=True)
+
+        if args.all:
+            # 一次生成全部页面
+            print("正在生成全部账单页面...")
+            generate_all_reports(conn, web_dir)
+
+        elif summary:
             # 生成历史账单汇总页面
             print("正在生成历史账单汇总页面...")
-            
+
+            # 数据没有变化时直接跳过查询和渲染
+            output_file = os.path.join(web_dir, "bill_summary.html")
+            if is_output_up_to_date(output_file, get_update_timestamp(conn)):
+                print(f"数据无变化，跳过生成: {output_file}")
+                return
+
             # 获取最近3个月数据
             recent_months_data = get_recent_3_months_data(conn)
             print(f"找到 {len(recent_months_data)} 个月的数据")
@@ -904,8 +845,9 @@ def main():
                 print("未找到任何消费数据")
                 return
             
-            # 获取最新更新时间
-            update_time = get_summary_latest_update_time(conn)
+            # 最新更新时间直接取自年度汇总行（覆盖全部数据），无需再查一次
+            update_time = format_update_time(
+                max((row[3] for row in all_years_data if row[3]), default=None))
             print(f"数据更新时间: {update_time}")
             
             # 生成HTML
@@ -913,44 +855,47 @@ def main():
             html_content = generate_summary_html(recent_months_data, all_years_data, update_time)
             
             # 保存HTML文件
-            output_file = os.path.join(web_dir, "bill_summary.html")
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(html_content)
+            write_html_file(output_file, html_content)
             
             print(f"汇总HTML页面已生成: {output_file}")
             
         elif month is not None:
             # 生成月度账单
+            # 数据没有变化时直接跳过查询和渲染
+            output_file = os.path.join(web_dir, f"bill_{year}_{month:02d}.html")
+            start, end = get_month_range(year, month)
+            if is_output_up_to_date(output_file, get_update_timestamp(conn, start, end)):
+                print(f"数据无变化，跳过生成: {output_file}")
+                return
+
             print(f"正在提取{year}年{month}月消费数据...")
             data = get_monthly_data(conn, year, month)
-            
-            if not data:
+
+            # 生成HTML（数据边流式读取边渲染）
+            print("正在生成HTML页面...")
+            html_content, total_amount, update_time = generate_html(data, year, month)
+
+            if html_content is None:
                 print(f"未找到{year}年{month}月的消费数据")
                 return
-            
-            print(f"找到 {len(data)} 条消费记录")
-            
-            # 计算总金额
-            total_amount = calculate_total_amount(data)
+
             print(f"总金额: {format_amount(total_amount)}")
-            
-            # 获取最新更新时间
-            update_time = get_latest_update_time(conn, year, month)
             print(f"数据更新时间: {update_time}")
-            
-            # 生成HTML
-            print("正在生成HTML页面...")
-            html_content = generate_html(data, total_amount, update_time, year, month)
-            
+
             # 保存HTML文件，命名规则为 bill_yyyy_MM.html
-            output_file = os.path.join(web_dir, f"bill_{year}_{month:02d}.html")
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(html_content)
+            write_html_file(output_file, html_content)
             
             print(f"HTML页面已生成: {output_file}")
             
         else:
             # 生成年度账单
+            # 数据没有变化时直接跳过查询和渲染
+            output_file = os.path.join(web_dir, f"bill_{year}_annual.html")
+            year_start, year_end = get_year_range(year)
+            if is_output_up_to_date(output_file, get_update_timestamp(conn, year_start, year_end)):
+                print(f"数据无变化，跳过生成: {output_file}")
+                return
+
             print(f"正在提取{year}年度消费数据...")
             monthly_data = get_annual_data(conn, year)
             
@@ -960,12 +905,13 @@ def main():
             
             print(f"找到 {len(monthly_data)} 个月的数据")
             
-            # 计算总金额
-            total_amount = sum([float(row[1]) for row in monthly_data])
+            # 计算总金额（SUM(AMOUNT)取回的就是REAL，无需逐行float转换）
+            total_amount = sum(row[1] for row in monthly_data)
             print(f"总金额: {format_amount(total_amount)}")
             
-            # 获取最新更新时间
-            update_time = get_annual_latest_update_time(conn, year)
+            # 最新更新时间直接取自月度汇总行，无需再查一次
+            update_time = format_update_time(
+                max((row[3] for row in monthly_data if row[3]), default=None))
             print(f"数据更新时间: {update_time}")
             
             # 生成HTML
@@ -973,14 +919,16 @@ def main():
             html_content = generate_annual_html(monthly_data, total_amount, update_time, year)
             
             # 保存HTML文件，命名规则为 bill_yyyy_annual.html
-            output_file = os.path.join(web_dir, f"bill_{year}_annual.html")
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(html_content)
+            write_html_file(output_file, html_content)
             
             print(f"年度HTML页面已生成: {output_file}")
         
         print("生成完成！")
-        
+
+    except sqlite3.Error as e:
+        # 查询函数不再逐个吞掉数据库错误，统一在这里报告并以非零码退出
+        print(f"数据库错误: {e}")
+        sys.exit(1)
     finally:
         conn.close()
 
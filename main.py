@@ -7,99 +7,148 @@
 
 import os
 import sys
+import json
 import sqlite3
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
 from generate_bill_report import (
-    connect_database, 
-    get_monthly_data, 
-    get_annual_data, 
+    connect_database,
+    get_monthly_data,
+    get_monthly_data_bulk,
+    get_annual_data,
     get_all_years_data,
     get_recent_3_months_data,
-    get_latest_update_time,
-    get_annual_latest_update_time,
-    get_summary_latest_update_time,
+    format_update_time,
     generate_html,
     generate_annual_html,
     generate_summary_html,
-    calculate_total_amount,
-    format_amount
+    format_amount,
+    write_html_file
 )
 
+# SQL语句常量。sqlite3按SQL文本缓存已编译的语句，
+# 固定复用同一字符串对象可以跳过重复的parse/plan
+# UPDATE_TIME本身就是Unix秒，CAST只是把列的类型钉死成整数：
+# 与文件mtime的比较始终是整数比较，不依赖SQLite的动态类型
+# 月/年/全库三级更新时间一次取回：按月聚合只做一次（走idx_bill_ym，
+# 月份值来自索引本身，不逐行计算SUBSTR）并物化为m，年度和全库的
+# 极值在m这张小结果集上二次汇总，行用kind列打标签路由
+SQL_UPDATE_TIMES_ROLLUP = """
+    WITH m AS (
+        SELECT
+            year_month,
+            MAX(CAST(UPDATE_TIME AS INTEGER)) as latest_update
+        FROM BILL
+        WHERE TYPE = '消费'
+        GROUP BY year_month
+    )
+    SELECT 'month' as kind, year_month as period, latest_update FROM m
+    UNION ALL
+    SELECT 'year', SUBSTR(year_month, 1, 4), MAX(latest_update) FROM m
+    GROUP BY SUBSTR(year_month, 1, 4)
+    UNION ALL
+    SELECT 'all', '', MAX(latest_update) FROM m
+    """
+
 def get_database_update_times(conn):
-    """获取数据库中所有年月和年份的最新更新时间"""
+    """获取数据库中所有年月和年份的最新更新时间
+
+    一条WITH查询同时产出月、年、全库三种汇总行，BILL表只扫一遍，
+    这里按kind标签把行分发进对应的结构。
+    """
     monthly_times = {}
     annual_times = {}
     summary_time = None
-    
-    try:
-        cursor = conn.cursor()
-        
-        # 获取所有年月的更新时间
-        monthly_query = """
-        SELECT 
-            SUBSTR(TIME, 1, 4) as year,
-            SUBSTR(TIME, 1, 7) as year_month,
-            MAX(UPDATE_TIME) as latest_update
-        FROM BILL 
-        WHERE TYPE = '消费'
-        GROUP BY SUBSTR(TIME, 1, 7)
-        ORDER BY year_month
-        """
-        cursor.execute(monthly_query)
-        monthly_results = cursor.fetchall()
-        
-        for year, year_month, update_time in monthly_results:
-            if update_time:
-                year_int = int(year)
-                month_int = int(year_month.split('-')[1])
-                monthly_times[(year_int, month_int)] = update_time
-        
-        # 获取所有年份的更新时间
-        annual_query = """
-        SELECT 
-            SUBSTR(TIME, 1, 4) as year,
-            MAX(UPDATE_TIME) as latest_update
-        FROM BILL 
-        WHERE TYPE = '消费'
-        GROUP BY SUBSTR(TIME, 1, 4)
-        ORDER BY year
-        """
-        cursor.execute(annual_query)
-        annual_results = cursor.fetchall()
-        
-        for year, update_time in annual_results:
-            if update_time:
-                year_int = int(year)
-                annual_times[year_int] = update_time
-        
-        # 获取汇总数据的更新时间
-        summary_query = """
-        SELECT MAX(UPDATE_TIME) 
-        FROM BILL 
-        WHERE TYPE = '消费'
-        """
-        cursor.execute(summary_query)
-        summary_result = cursor.fetchone()
-        if summary_result and summary_result[0]:
-            summary_time = summary_result[0]
-            
-    except sqlite3.Error as e:
-        print(f"查询数据库更新时间错误: {e}")
-        return {}, {}, None
-    
+
+    # 直接迭代游标，不先fetchall物化整个结果列表；
+    # arraysize放大到1000让底层每次批量搬运足够多的行
+    cursor = conn.execute(SQL_UPDATE_TIMES_ROLLUP)
+    cursor.arraysize = 1000
+
+    for kind, period, update_time in cursor:
+        if not update_time:
+            continue
+        if kind == 'month':
+            year_str, month_str = period.split('-')
+            monthly_times[(int(year_str), int(month_str))] = update_time
+        elif kind == 'year':
+            annual_times[int(period)] = update_time
+        else:
+            summary_time = update_time
+
     return monthly_times, annual_times, summary_time
 
-def get_html_file_modification_time(file_path):
-    """获取HTML文件的修改时间（Unix时间戳）"""
-    if not os.path.exists(file_path):
+# 更新时间查询结果的缓存文件名（存放在输出目录）
+STATE_FILE_NAME = ".bill_reporter_state.json"
+
+# tzinfo对象取一次备用，避免在循环里反复取属性
+UTC = timezone.utc
+
+def _format_log_time(timestamp):
+    """把时间戳格式化进"需要重新生成"的日志行；只在该分支里调用，
+    跳过路径不做任何datetime分配"""
+    if timestamp is None:
+        return '不存在'
+    return datetime.fromtimestamp(timestamp, UTC).strftime('%Y-%m-%d %H:%M UTC')
+
+def get_database_fingerprint(db_path):
+    """数据库文件（含-wal）的 (mtime_ns, size) 指纹
+
+    指纹不变说明两次运行之间没有任何写入，可以直接复用上一次的
+    更新时间查询结果。本想用PRAGMA data_version，但它只在同一连接
+    的生命周期内有意义，跨进程运行之间不可比。
+    """
+    fingerprint = []
+    for path in (db_path, db_path + "-wal"):
+        try:
+            st = os.stat(path)
+            fingerprint.append([st.st_mtime_ns, st.st_size])
+        except OSError:
+            fingerprint.append(None)
+    return fingerprint
+
+def load_cached_update_times(state_file, fingerprint):
+    """指纹匹配时返回缓存的 (monthly_times, annual_times, summary_time)，否则None"""
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('fingerprint') != fingerprint:
+            return None
+        monthly_times = {}
+        for key, update_time in state['monthly_times'].items():
+            year_str, month_str = key.split('-')
+            monthly_times[(int(year_str), int(month_str))] = update_time
+        annual_times = {int(year): t for year, t in state['annual_times'].items()}
+        return monthly_times, annual_times, state['summary_time']
+    except (OSError, ValueError, KeyError):
         return None
-    
+
+def save_update_times_state(state_file, fingerprint, monthly_times, annual_times, summary_time):
+    """持久化更新时间查询结果，供下一次运行在指纹未变时复用"""
+    state = {
+        'fingerprint': fingerprint,
+        'monthly_times': {f"{y}-{m:02d}": t for (y, m), t in monthly_times.items()},
+        'annual_times': {str(year): t for year, t in annual_times.items()},
+        'summary_time': summary_time,
+    }
+    try:
+        with open(state_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+    except OSError as e:
+        print(f"写入状态缓存失败（忽略）: {e}")
+
+def get_output_mtimes(output_dir):
+    """一次scandir建立输出目录的 文件名->修改时间 映射
+
+    逐个文件os.path.getmtime是每个文件一次stat系统调用；
+    scandir读一次目录就拿到全部条目的元信息。
+    """
     try:
-        mtime = os.path.getmtime(file_path)
-        return mtime
+        with os.scandir(output_dir) as entries:
+            return {entry.name: entry.stat().st_mtime for entry in entries}
     except OSError:
-        return None
+        return {}
 
 def needs_regeneration(db_time, html_time):
     """判断是否需要重新生成文件"""
@@ -109,34 +158,39 @@ def needs_regeneration(db_time, html_time):
         return True
     return db_time > html_time
 
-def generate_monthly_bill(conn, year, month, output_dir):
-    """生成月度账单"""
+def generate_monthly_bill(data, year, month, output_dir):
+    """生成月度账单，data为该月的明细行迭代器"""
     print(f"正在生成 {year}年{month:02d}月账单...")
-    
-    # 获取月度数据
-    data = get_monthly_data(conn, year, month)
-    if not data:
+
+    # 流式生成HTML（总金额、更新时间在同一遍扫描中得出）
+    html_content, total_amount, update_time = generate_html(data, year, month)
+    if html_content is None:
         print(f"未找到{year}年{month:02d}月的消费数据")
         return False
-    
-    # 计算总金额
-    total_amount = calculate_total_amount(data)
+
     print(f"总金额: {format_amount(total_amount)}")
-    
-    # 获取更新时间
-    update_time = get_latest_update_time(conn, year, month)
-    
-    # 生成HTML
-    html_content = generate_html(data, total_amount, update_time, year, month)
-    
+
     # 保存文件
     output_file = os.path.join(output_dir, f"bill_{year}_{month:02d}.html")
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    write_html_file(output_file, html_content)
     
     print(f"月度账单已生成: {output_file}")
     return True
 
+def _generate_month_worker(db_path, year, month, output_dir):
+    """子进程入口：生成单个月度账单
+
+    sqlite3连接不能跨进程传递，每个子进程用数据库路径自己建立连接。
+    """
+    conn = connect_database(db_path)
+    if not conn:
+        return False
+    try:
+        data = get_monthly_data(conn, year, month)
+        return generate_monthly_bill(data, year, month, output_dir)
+    finally:
+        conn.close()
+
 def generate_annual_bill(conn, year, output_dir):
     """生成年度账单"""
     print(f"正在生成 {year}年度账单...")
@@ -147,20 +201,20 @@ def generate_annual_bill(conn, year, output_dir):
         print(f"未找到{year}年的消费数据")
         return False
     
-    # 计算总金额
-    total_amount = sum([float(row[1]) for row in monthly_data])
+    # 计算总金额（SUM(AMOUNT)取回的就是REAL，无需逐行float转换）
+    total_amount = sum(row[1] for row in monthly_data)
     print(f"总金额: {format_amount(total_amount)}")
     
-    # 获取更新时间
-    update_time = get_annual_latest_update_time(conn, year)
-    
+    # 最新更新时间直接取自月度汇总行，无需再查一次
+    update_time = format_update_time(
+        max((row[3] for row in monthly_data if row[3]), default=None))
+
     # 生成HTML
     html_content = generate_annual_html(monthly_data, total_amount, update_time, year)
     
     # 保存文件
     output_file = os.path.join(output_dir, f"bill_{year}_annual.html")
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    write_html_file(output_file, html_content)
     
     print(f"年度账单已生成: {output_file}")
     return True
@@ -181,16 +235,16 @@ def generate_summary_bill(conn, output_dir):
         print("未找到任何消费数据")
         return False
     
-    # 获取更新时间
-    update_time = get_summary_latest_update_time(conn)
-    
+    # 最新更新时间直接取自年度汇总行（覆盖全部数据），无需再查一次
+    update_time = format_update_time(
+        max((row[3] for row in all_years_data if row[3]), default=None))
+
     # 生成HTML
     html_content = generate_summary_html(recent_months_data, all_years_data, update_time)
     
     # 保存文件
     output_file = os.path.join(output_dir, "bill_summary.html")
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    write_html_file(output_file, html_content)
     
     print(f"汇总账单已生成: {output_file}")
     return True
@@ -206,62 +260,98 @@ def main():
     db_path = args.db
     output_dir = args.output
     
-    # 检查数据库文件是否存在
-    if not os.path.exists(db_path):
-        print(f"错误: 数据库文件 {db_path} 不存在")
-        return 1
-    
-    # 确保输出目录存在
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-        print(f"创建输出目录: {output_dir}")
-    
-    # 连接数据库
+    # 确保输出目录存在（exist_ok避免先exists再makedirs的两次系统调用和竞态）
+    os.makedirs(output_dir, exist_ok=True)
+
+    # 指纹必须在建立连接之前采集：连接本身会创建临时的-wal文件，
+    # 连接后再stat会把自己的WAL也算进指纹，导致缓存永远不命中
+    fingerprint = get_database_fingerprint(db_path)
+
+    # 连接数据库（文件不存在的情况由connect_database报告）
     conn = connect_database(db_path)
     if not conn:
         return 1
     
     try:
-        # 获取数据库中的更新时间
+        # 获取数据库中的更新时间：数据库文件指纹没变时复用上次的结果，
+        # 安静的定时任务运行完全不触发聚合扫描
         print("正在查询数据库更新时间...")
-        monthly_times, annual_times, summary_time = get_database_update_times(conn)
+        state_file = os.path.join(output_dir, STATE_FILE_NAME)
+        cached = load_cached_update_times(state_file, fingerprint)
+        if cached is not None:
+            monthly_times, annual_times, summary_time = cached
+            print("数据库无变化，复用上次的更新时间")
+        else:
+            monthly_times, annual_times, summary_time = get_database_update_times(conn)
+            save_update_times_state(state_file, fingerprint,
+                                    monthly_times, annual_times, summary_time)
         
         print(f"找到 {len(monthly_times)} 个月的数据")
         print(f"找到 {len(annual_times)} 年的数据")
-        
+
+        # 一次读取输出目录的全部修改时间，后面按文件名查表
+        output_mtimes = get_output_mtimes(output_dir)
+
         generated_count = 0
         skipped_monthly = 0
         skipped_annual = 0
         skipped_summary = 0
         
-        # 1. 处理月度账单
+        # 1. 处理月度账单：先收集需要重新生成的月份，再一次批量取回明细
         print("\n=== 检查月度账单 ===")
-        for (year, month), db_time in monthly_times.items():
-            html_file = os.path.join(output_dir, f"bill_{year}_{month:02d}.html")
-            html_time = get_html_file_modification_time(html_file)
-            
-            if needs_regeneration(db_time, html_time):
-                print(f"{year}年{month:02d}月需要重新生成 (数据库: {datetime.fromtimestamp(db_time, timezone.utc).strftime('%Y-%m-%d %H:%M UTC')}, HTML: {datetime.fromtimestamp(html_time, timezone.utc).strftime('%Y-%m-%d %H:%M UTC') if html_time else '不存在'})")
-                if generate_monthly_bill(conn, year, month, output_dir):
+        months_to_generate = []
+        # 批量短路：数据库里最新的更新时间不晚于这组文件中最旧的mtime时，
+        # 逐月检查不可能命中，整组直接跳过（缺文件按0参与取最小值，不会误跳）
+        if monthly_times and max(monthly_times.values()) <= min(
+                output_mtimes.get(f"bill_{y}_{m:02d}.html", 0)
+                for (y, m) in monthly_times):
+            skipped_monthly = len(monthly_times)
+        else:
+            for (year, month), db_time in monthly_times.items():
+                html_time = output_mtimes.get(f"bill_{year}_{month:02d}.html")
+
+                if needs_regeneration(db_time, html_time):
+                    print(f"{year}年{month:02d}月需要重新生成 (数据库: {_format_log_time(db_time)}, HTML: {_format_log_time(html_time)})")
+                    months_to_generate.append((year, month))
+                else:
+                    skipped_monthly += 1
+
+        # 月份之间互不依赖：需要重建的月份多时分派到子进程并行生成，
+        # 每个子进程各自扫描并拼接HTML，多核上重叠；月份少时进程池的
+        # 启动开销不划算，仍走单连接的批量查询
+        if len(months_to_generate) > 2 and (os.cpu_count() or 1) > 1:
+            with ProcessPoolExecutor() as executor:
+                futures = [executor.submit(_generate_month_worker,
+                                           db_path, year, month, output_dir)
+                           for year, month in months_to_generate]
+                for future in futures:
+                    if future.result():
+                        generated_count += 1
+        else:
+            for year, month, data in get_monthly_data_bulk(conn, months_to_generate):
+                if generate_monthly_bill(data, year, month, output_dir):
                     generated_count += 1
-            else:
-                skipped_monthly += 1
-        
+
         if skipped_monthly > 0:
             print(f"跳过 {skipped_monthly} 个月度账单（无需更新）")
         
         # 2. 处理年度账单
         print("\n=== 检查年度账单 ===")
-        for year, db_time in annual_times.items():
-            html_file = os.path.join(output_dir, f"bill_{year}_annual.html")
-            html_time = get_html_file_modification_time(html_file)
-            
-            if needs_regeneration(db_time, html_time):
-                print(f"{year}年需要重新生成 (数据库: {datetime.fromtimestamp(db_time, timezone.utc).strftime('%Y-%m-%d %H:%M UTC')}, HTML: {datetime.fromtimestamp(html_time, timezone.utc).strftime('%Y-%m-%d %H:%M UTC') if html_time else '不存在'})")
-                if generate_annual_bill(conn, year, output_dir):
-                    generated_count += 1
-            else:
-                skipped_annual += 1
+        # 与月度账单相同的批量短路（汇总账单本身只有一次比较，无需短路）
+        if annual_times and max(annual_times.values()) <= min(
+                output_mtimes.get(f"bill_{y}_annual.html", 0)
+                for y in annual_times):
+            skipped_annual = len(annual_times)
+        else:
+            for year, db_time in annual_times.items():
+                html_time = output_mtimes.get(f"bill_{year}_annual.html")
+
+                if needs_regeneration(db_time, html_time):
+                    print(f"{year}年需要重新生成 (数据库: {_format_log_time(db_time)}, HTML: {_format_log_time(html_time)})")
+                    if generate_annual_bill(conn, year, output_dir):
+                        generated_count += 1
+                else:
+                    skipped_annual += 1
         
         if skipped_annual > 0:
             print(f"跳过 {skipped_annual} 个年度账单（无需更新）")
@@ -269,11 +359,10 @@ def main():
         # 3. 处理汇总账单
         print("\n=== 检查汇总账单 ===")
         if summary_time:
-            html_file = os.path.join(output_dir, "bill_summary.html")
-            html_time = get_html_file_modification_time(html_file)
-            
+            html_time = output_mtimes.get("bill_summary.html")
+
             if needs_regeneration(summary_time, html_time):
-                print(f"汇总账单需要重新生成 (数据库: {datetime.fromtimestamp(summary_time, timezone.utc).strftime('%Y-%m-%d %H:%M UTC')}, HTML: {datetime.fromtimestamp(html_time, timezone.utc).strftime('%Y-%m-%d %H:%M UTC') if html_time else '不存在'})")
+                print(f"汇总账单需要重新生成 (数据库: {_format_log_time(summary_time)}, HTML: {_format_log_time(html_time)})")
                 if generate_summary_bill(conn, output_dir):
                     generated_count += 1
             else:
@@ -282,11 +371,24 @@ def main():
         if skipped_summary > 0:
             print("跳过汇总账单（无需更新）")
         
+        # 写出都走临时文件+rename；结尾对输出目录fsync一次，
+        # 本轮所有rename一并落盘，代替每个文件各自的元数据刷写
+        if generated_count > 0:
+            dir_fd = os.open(output_dir, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
         print(f"\n=== 完成 ===")
         print(f"共生成了 {generated_count} 个账单文件")
         
         return 0
-        
+
+    except sqlite3.Error as e:
+        # 查询函数不再逐个吞掉数据库错误，统一在这里报告并以非零码退出
+        print(f"数据库错误: {e}")
+        return 1
     finally:
         conn.close()
 
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+账单页面静态模板块
+三个页面的CSS/JS部分完全静态，集中在本模块、导入时构建一次，
+渲染代码只负责拼接随数据变化的部分
+"""
+
+# 月度账单页面的静态CSS/JS块。与模板其余部分分离为模块常量，
+# 只在导入时构建一次，生成页面时不再为这段纯静态内容做花括号转义扫描
+MONTHLY_PAGE_STYLE = """    <style>
+        body {
+            font-family: 'Microsoft YaHei', Arial, sans-serif;
+            margin: 0;
+            padding: 20px;
+            background-color: white;
+            color: #333;
+        }
+        .container {
+            max-width: 800px;
+            margin: 0 auto;
+            background: white;
+        }
+        .header {
+            padding: 20px 0;
+            border-bottom: 1px solid #eee;
+            position: relative;
+        }
+        .header h1 {
+            margin: 0 0 20px 0;
+            font-size: 1.4em;
+            font-weight: 500;
+            color: #333;
+        }
+        .total-amount {
+            font-size: 3em;
+            font-weight: bold;
+            color: #333;
+            margin: 20px 0;
+        }
+        .update-time {
+            position: absolute;
+            top: 20px;
+            right: 0;
+            font-size: 0.9em;
+            color: #666;
+            text-align: right;
+        }
+        .sort-control {
+            position: absolute;
+            top: 85px;
+            right: 0;
+            z-index: 10;
+        }
+        .sort-select {
+            padding: 8px 12px;
+            border: 1px solid #333;
+            background: white;
+            font-size: 0.9em;
+            cursor: pointer;
+        }
+        .transaction-list {
+            margin-top: 20px;
+            display: flex;
+            flex-direction: column;
+        }
+        .transaction-item {
+            padding: 15px 0 15px 15px;
+            border-bottom: 1px solid #eee;
+            display: flex;
+            justify-content: space-between;
+            position: relative;
+        }
+        /* 金额排序通过每条记录预先算好的--ao（负的金额分值）驱动flex order，
+           切换排序只需改容器类名，无需JS解析金额或搬动DOM节点 */
+        .transaction-list.sort-amount .transaction-item {
+            order: var(--ao);
+        }
+        .lazy-sentinel {
+            height: 1px;
+        }
+        .transaction-decoration {
+            position: absolute;
+            left: 0;
+            top: 20px;
+            bottom: 20px;
+            width: 4px;
+            border-radius: 2px;
+            background-color: #6c757d;
+        }
+        .transaction-decoration.cmbcc {
+            background-color: #dc3545;
+        }
+        .transaction-decoration.alipay {
+            background-color: #007bff;
+        }
+        .transaction-decoration.wechat {
+            background-color: #28a745;
+        }
+        .transaction-item:last-child {
+            border-bottom: none;
+        }
+        .transaction-left {
+            flex: 1;
+            margin-right: 20px;
+        }
+        .transaction-description {
+            font-size: 1em;
+            color: #333;
+            margin-bottom: 5px;
+            line-height: 1.4;
+        }
+        .transaction-meta {
+            display: flex;
+            align-items: center;
+            gap: 10px;
+            font-size: 0.85em;
+            color: #666;
+        }
+        .transaction-note {
+            color: #666;
+        }
+        .transaction-right {
+            text-align: right;
+            flex-shrink: 0;
+            display: flex;
+            flex-direction: column;
+            justify-content: center;
+        }
+        .transaction-amount {
+            font-size: 1em;
+            font-weight: 500;
+            color: #333;
+            margin-bottom: 3px;
+        }
+        .transaction-source {
+            font-size: 0.8em;
+            color: #666;
+        }
+    </style>
+    <script>
+        // 超出首屏的交易行以JSON内联在#restRows中，滚动到底部时分批补入，
+        // 避免大月份首次渲染就布局上千个节点
+        let restRows = null;
+        let restIndex = 0;
+        let lazyObserver = null;
+
+        function getRestRows() {
+            if (restRows === null) {
+                const el = document.getElementById('restRows');
+                restRows = el ? JSON.parse(el.textContent) : [];
+            }
+            return restRows;
+        }
+
+        function appendRows(count) {
+            const rows = getRestRows();
+            if (restIndex >= rows.length) return;
+            const list = document.querySelector('.transaction-list');
+            const end = Math.min(restIndex + count, rows.length);
+            let html = '';
+            for (; restIndex < end; restIndex++) {
+                // 字段顺序与生成端约定一致：
+                // [order值, 装饰条类名, 描述, 时间, 备注, 金额, 支付方式]
+                const r = rows[restIndex];
+                const note = r[4] ? '<span class="transaction-note">' + r[4] + '</span>' : '';
+                html += '<div class="transaction-item" style="--ao:' + r[0] + '">' +
+                    '<div class="transaction-decoration ' + r[1] + '"></div>' +
+                    '<div class="transaction-left">' +
+                    '<div class="transaction-description">' + r[2] + '</div>' +
+                    '<div class="transaction-meta"><span>' + r[3] + '</span>' + note + '</div>' +
+                    '</div>' +
+                    '<div class="transaction-right">' +
+                    '<div class="transaction-amount">¥' + r[5] + '</div>' +
+                    '<div class="transaction-source">' + r[6] + '</div>' +
+                    '</div></div>';
+            }
+            list.insertAdjacentHTML('beforeend', html);
+            if (restIndex >= rows.length) {
+                if (lazyObserver) lazyObserver.disconnect();
+                const sentinel = document.getElementById('lazySentinel');
+                if (sentinel) sentinel.remove();
+            }
+        }
+
+        function sortTransactions() {
+            const select = document.getElementById('sortSelect');
+            const transactionList = document.querySelector('.transaction-list');
+            // 按金额排序依赖CSS order覆盖全部记录，先把懒加载的剩余行补齐
+            if (select.value === 'amount') {
+                appendRows(getRestRows().length);
+            }
+            transactionList.classList.toggle('sort-amount', select.value === 'amount');
+        }
+
+        document.addEventListener('DOMContentLoaded', () => {
+            const sentinel = document.getElementById('lazySentinel');
+            if (!sentinel) return;
+            lazyObserver = new IntersectionObserver((entries) => {
+                if (entries.some(e => e.isIntersecting)) appendRows(50);
+            }, { rootMargin: '400px' });
+            lazyObserver.observe(sentinel);
+        });
+    </script>"""
+
+# 年度账单页面的静态CSS/JS块，模块导入时构建一次
+ANNUAL_PAGE_STYLE = """    <style>
+        body {
+            font-family: 'Microsoft YaHei', Arial, sans-serif;
+            margin: 0;
+            padding: 20px;
+            background-color: white;
+            color: #333;
+        }
+        .container {
+            max-width: 800px;
+            margin: 0 auto;
+            background: white;
+        }
+        .header {
+            padding: 20px 0;
+            border-bottom: 1px solid #eee;
+            position: relative;
+        }
+        .header h1 {
+            margin: 0 0 20px 0;
+            font-size: 1.4em;
+            font-weight: 500;
+            color: #333;
+        }
+        .total-amount {
+            font-size: 3em;
+            font-weight: bold;
+            color: #333;
+            margin: 20px 0;
+        }
+        .update-time {
+            position: absolute;
+            top: 20px;
+            right: 0;
+            font-size: 0.9em;
+            color: #666;
+            text-align: right;
+        }
+        .sort-control {
+            position: absolute;
+            top: 85px;
+            right: 0;
+            z-index: 10;
+        }
+        .sort-select {
+            padding: 8px 12px;
+            border: 1px solid #333;
+            background: white;
+            font-size: 0.9em;
+            cursor: pointer;
+        }
+        .monthly-list {
+            margin-top: 20px;
+            display: flex;
+            flex-direction: column;
+        }
+        /* 与月度页面一致：金额排序由每项预先算好的--ao驱动flex order，
+           切换排序只改容器类名，无需JS解析金额或搬动DOM节点 */
+        .monthly-list.sort-amount .monthly-item {
+            order: var(--ao);
+        }
+        .monthly-item {
+            display: block;
+            padding: 20px 0;
+            border-bottom: 1px solid #eee;
+            position: relative;
+            cursor: pointer;
+            text-decoration: none;
+            color: inherit;
+        }
+        .monthly-item:last-child {
+            border-bottom: none;
+        }
+        .monthly-header {
+            display: flex;
+            justify-content: space-between;
+            align-items: center;
+            margin-bottom: 10px;
+        }
+        .month-label {
+            font-size: 1.1em;
+            font-weight: 500;
+            color: #333;
+        }
+        .month-amount {
+            font-size: 1.1em;
+            font-weight: 500;
+            color: #333;
+        }
+        .progress-bar-container {
+            width: 100%;
+            height: 12px;
+            background-color: #f0f0f0;
+            border-radius: 6px;
+            overflow: hidden;
+            position: relative;
+        }
+        .progress-bar {
+            height: 100%;
+            background-color: #007bff;
+            border-radius: 6px;
+            transition: width 0.3s ease;
+        }
+    </style>
+    <script>
+        function sortMonthlyData() {
+            const select = document.getElementById('sortSelect');
+            const monthlyList = document.querySelector('.monthly-list');
+            // 两种顺序都已在生成时排好（时间=DOM顺序，金额=CSS order），
+            // 这里只切换容器类名
+            monthlyList.classList.toggle('sort-amount', select.value === 'amount');
+        }
+
+    </script>"""
+
+# 汇总账单页面的静态CSS块，模块导入时构建一次
+SUMMARY_PAGE_STYLE = """    <style>
+        body {
+            font-family: 'Microsoft YaHei', Arial, sans-serif;
+            margin: 0;
+            padding: 20px;
+            background-color: white;
+            color: #333;
+        }
+        .container {
+            max-width: 1000px;
+            margin: 0 auto;
+            background: white;
+        }
+        .header {
+            padding: 20px 0;
+            border-bottom: 1px solid #eee;
+            position: relative;
+        }
+        .header h1 {
+            margin: 0 0 20px 0;
+            font-size: 1.8em;
+            font-weight: 500;
+            color: #333;
+        }
+        .update-time {
+            position: absolute;
+            top: 20px;
+            right: 0;
+            font-size: 0.9em;
+            color: #666;
+            text-align: right;
+        }
+        .section {
+            margin: 30px 0;
+        }
+        .section-title {
+            font-size: 1.2em;
+            font-weight: 500;
+            color: #333;
+            margin-bottom: 20px;
+        }
+        .summary-grid {
+            display: grid;
+            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
+            gap: 20px;
+            margin-bottom: 30px;
+        }
+        .summary-item {
+            background-color: #e3f2fd;
+            border-radius: 8px;
+            padding: 20px;
+            text-align: center;
+            text-decoration: none;
+            color: inherit;
+            transition: background-color 0.3s ease;
+        }
+        .summary-item:hover {
+            background-color: #bbdefb;
+        }
+        .summary-period {
+            font-size: 1em;
+            font-weight: 500;
+            color: #333;
+            margin-bottom: 10px;
+        }
+        .summary-amount {
+            font-size: 1.2em;
+            font-weight: bold;
+            color: #333;
+        }
+        .years-grid {
+            display: grid;
+            grid-template-columns: repeat(auto-fit, minmax(150px, 1fr));
+            gap: 15px;
+        }
+        .year-item {
+            background-color: #e3f2fd;
+            border-radius: 8px;
+            padding: 15px;
+            text-align: center;
+            text-decoration: none;
+            color: inherit;
+            transition: background-color 0.3s ease;
+        }
+        .year-item:hover {
+            background-color: #bbdefb;
+        }
+        .year-period {
+            font-size: 0.9em;
+            font-weight: 500;
+            color: #333;
+            margin-bottom: 8px;
+        }
+        .year-amount {
+            font-size: 1.1em;
+            font-weight: bold;
+            color: #333;
+        }
+    </style>"""